@@ -1,9 +1,15 @@
 import os
-import pandas as pd
+import glob
+import hashlib
+import importlib.util
 import numpy as np
-import matplotlib.pyplot as plt
 import streamlit as st
-from sklearn.linear_model import LinearRegression
+
+try:
+    # AOT-compiled kernel, built with `python build_kernel.py`
+    from idss_kernel import compute_decision, predict_operating_costs
+except ImportError:
+    from decision_kernel import compute_decision, predict_operating_costs
 
 # Configure page settings
 st.set_page_config(
@@ -13,81 +19,204 @@ st.set_page_config(
 )
 
 # === Helper Functions ===
-def calculate_weighted_score(cost_score, style_score, reliability_score, fuel_economy_score, safety_score, weights):
-    return (weights['cost'] * cost_score +
-            weights['style'] * style_score +
-            weights['reliability'] * reliability_score +
-            weights['fuel_economy'] * fuel_economy_score +
-            weights['safety'] * safety_score)
-
-def calculate_pv(cash_flows, discount_rate=0.05):
-    return sum([cf / (1 + discount_rate)**year for year, cf in enumerate(cash_flows, start=0)])
+# Column order of the feature matrix and the weights vector
+WEIGHT_FACTORS = ['Cost', 'Style', 'Reliability', 'Fuel Economy', 'Safety']
 
-def predict_operating_costs(operating_costs):
+@st.cache_data(show_spinner=False, max_entries=128)
+def predict_defender_costs(operating_costs):
     """
-    Predict the operating costs for the next 5 years using linear regression.
-    Input: `operating_costs` must have exactly 3 values.
+    Memoized predict_operating_costs keyed on the tuple of 3 past yearly costs.
+    st.cache_data outlives the rerun, so reruns that only change other inputs
+    skip the regression. Returns a tuple of the 5 predicted costs.
     """
-    if len(operating_costs) != 3:
-        raise ValueError("Operating costs must have exactly 3 years of data.")
-    past_years = np.array([1, 2, 3]).reshape(-1, 1)
-    model = LinearRegression()
-    model.fit(past_years, operating_costs)
-    future_years = np.array([4, 5, 6, 7, 8]).reshape(-1, 1)
-    return [max(0, cf) for cf in model.predict(future_years)]
+    return tuple(predict_operating_costs(np.asarray(operating_costs, dtype=np.float64)).tolist())
 
 def format_cash_flows(cash_flows):
-    inflows = [cf if cf > 0 else 0 for cf in cash_flows]
-    outflows = [abs(cf) if cf < 0 else 0 for cf in cash_flows]
-    return inflows, outflows
+    cf = np.asarray(cash_flows, dtype=np.float64)
+    return np.maximum(cf, 0.0), np.maximum(-cf, 0.0)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def plot_cash_flow(cash_flows, title, color):
+    """
+    Build the cash flow bar chart for one scenario. Figures are cached by their
+    inputs and closed so pyplot does not keep every one alive across reruns;
+    st.cache_data hands each caller its own unpickled copy, so concurrent
+    sessions never render the same Figure object.
+    """
+    import matplotlib.pyplot as plt  # only needed on the results page
+
+    fig, ax = plt.subplots(figsize=(6, 4))
+    ax.bar(range(len(cash_flows)), cash_flows, color=color)
+    ax.axhline(0, color='black', linewidth=0.8)
+    ax.set_ylim(min(cash_flows) - 5000, max(cash_flows) + 5000)
+    ax.set_title(title, fontsize=10)
+    ax.set_xlabel("Year", fontsize=8)
+    ax.set_ylabel("Cash Flow (USD)", fontsize=8)
+    plt.close(fig)
+    return fig
+
+# Prefer the Rust-based calamine reader; fall back to openpyxl when it is not installed
+_EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+
+# Bump whenever the way sheets are parsed changes, so stale pickles are ignored
+_SHEET_CACHE_VERSION = 2
+
+def _file_digest(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:16]
+
+@st.cache_data(show_spinner=False)
+def _read_excel_cached(file_path, mtime, sheet_name, required_columns):
+    """
+    Parse an Excel sheet, reusing a pickled copy keyed by the file's content hash.
+    `mtime` is only part of the in-memory cache key so edits to the file are picked up.
+    """
+    import pandas as pd  # only needed while the sheets are (re)loaded
+
+    cache_dir = os.path.join(base_dir, '.cache')
+    cache_path = os.path.join(
+        cache_dir, f"{_file_digest(file_path)}_{sheet_name}_v{_SHEET_CACHE_VERSION}_pd{pd.__version__}.pkl")
+    if os.path.isfile(cache_path):
+        try:
+            return pd.read_pickle(cache_path)
+        except Exception:
+            pass  # unreadable pickle: parse the sheet again and overwrite it
+    # Every sheet is a 'Car' name column plus numeric columns; declaring them
+    # up front skips pandas' per-column type inference
+    dtype = {col: 'string' if col == 'Car' else 'float64' for col in required_columns}
+    df = pd.read_excel(file_path, sheet_name=sheet_name, dtype=dtype, engine=_EXCEL_ENGINE)
+    missing_cols = [col for col in required_columns if col not in df.columns]
+    if missing_cols:
+        st.error(f"Missing columns {missing_cols} in sheet '{sheet_name}' of '{file_path}'.")
+        st.stop()
+    df['Car'] = df['Car'].str.strip()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        df.to_pickle(cache_path)
+        # Drop pickles of this sheet left behind by earlier file versions or pandas releases
+        for stale_path in glob.glob(os.path.join(cache_dir, f"*_{glob.escape(sheet_name)}*.pkl")):
+            if stale_path != cache_path:
+                os.remove(stale_path)
+    except OSError:
+        pass
+    return df
 
 def load_excel_data(file_path, sheet_name, required_columns):
     if not os.path.isfile(file_path):
         st.error(f"Error: The file '{file_path}' was not found.")
         st.stop()
     try:
-        df = pd.read_excel(file_path, sheet_name=sheet_name)
-        missing_cols = [col for col in required_columns if col not in df.columns]
-        if missing_cols:
-            st.error(f"Missing columns {missing_cols} in sheet '{sheet_name}' of '{file_path}'.")
-            st.stop()
-        df['Car'] = df['Car'].str.strip()
-        return df
+        return _read_excel_cached(file_path, os.path.getmtime(file_path), sheet_name, tuple(required_columns))
     except Exception as e:
         st.error(f"An error occurred while reading '{file_path}': {e}")
         st.stop()
 
+@st.cache_resource(show_spinner=False)
+def _load_static_data(data_mtimes):
+    """
+    Load the challenger sheets and build every lookup table used by the app.
+    Cached by reference across reruns and sessions; `data_mtimes` only keys the
+    cache so edits to the Excel files are picked up.
+    """
+    df_operating_costs = load_excel_data(operating_costs_file, 'OperatingCosts', ['Car', 'Year1', 'Year2', 'Year3', 'Year4', 'Year5'])
+    df_fuel_economy = load_excel_data(fuel_economy_file, 'FuelEconomy', ['Car', 'FuelEconomy'])
+    df_buying_prices = load_excel_data(buying_prices_file, 'BuyingPrices', ['Car', 'BuyingPrice'])
+
+    # Predefined Scores
+    reliability_scores = {'Japanese': 0.9, 'Korean': 0.8, 'American': 0.8, 'German': 0.7}
+    safety_scores = {'Japanese': 0.7, 'Korean': 0.8, 'American': 0.85, 'German': 0.9}
+    challenger_nationality = {
+        'Ford Explorer': 'American',
+        'Honda Accord': 'Japanese',
+        'Nissan Altima': 'Japanese',
+        'Toyota Camry': 'Japanese',
+        'Hyundai Sonata': 'Korean',
+        'BMW 5 Series': 'German'
+    }
+    depreciation_rates = {
+        'American': 0.15,
+        'Japanese': 0.11,
+        'German': 0.18,
+        'Korean': 0.13
+    }
+
+    # Challenger data is stored column-wise: one float64 array per attribute,
+    # rows aligned with `challenger_index` (buying price sheet order). Cars with
+    # no known nationality have no reliability or safety score, so they are left out
+    challenger_cars = [car for car in df_buying_prices['Car'].tolist() if car in challenger_nationality]
+    challenger_index = {car: i for i, car in enumerate(challenger_cars)}
+    challenger_operating_costs = df_operating_costs.set_index('Car').reindex(challenger_cars)[
+        ['Year1', 'Year2', 'Year3', 'Year4', 'Year5']].to_numpy(dtype=np.float64)
+    challenger_fuel_economy = df_fuel_economy.set_index('Car').reindex(challenger_cars)['FuelEconomy'].to_numpy(dtype=np.float64)
+    challenger_buying_prices = df_buying_prices.set_index('Car').reindex(challenger_cars)['BuyingPrice'].to_numpy(dtype=np.float64)
+    challenger_origins = [challenger_nationality[car] for car in challenger_cars]
+    challenger_reliability = np.array([reliability_scores[origin] for origin in challenger_origins], dtype=np.float64)
+    challenger_safety = np.array([safety_scores[origin] for origin in challenger_origins], dtype=np.float64)
+    challenger_dep_rates = np.array([depreciation_rates.get(origin, 0.1) for origin in challenger_origins], dtype=np.float64)
+
+    return (challenger_index, challenger_operating_costs, challenger_fuel_economy, challenger_buying_prices,
+            challenger_reliability, challenger_safety, challenger_dep_rates,
+            reliability_scores, safety_scores, depreciation_rates)
+
+def _data_mtimes():
+    return tuple(os.path.getmtime(path) if os.path.isfile(path) else None
+                 for path in (operating_costs_file, fuel_economy_file, buying_prices_file))
+
 # === Load Data ===
 base_dir = os.path.dirname(os.path.abspath(__file__))
 operating_costs_file = os.path.join(base_dir, 'data', 'challenger_operating_costs.xlsx')
 fuel_economy_file = os.path.join(base_dir, 'data', 'challenger_fuel_economy.xlsx')
 buying_prices_file = os.path.join(base_dir, 'data', 'challenger_buying_prices.xlsx')
 
-df_operating_costs = load_excel_data(operating_costs_file, 'OperatingCosts', ['Car', 'Year1', 'Year2', 'Year3', 'Year4', 'Year5'])
-df_fuel_economy = load_excel_data(fuel_economy_file, 'FuelEconomy', ['Car', 'FuelEconomy'])
-df_buying_prices = load_excel_data(buying_prices_file, 'BuyingPrices', ['Car', 'BuyingPrice'])
-
-challenger_operating_costs_data = df_operating_costs.set_index('Car').T.to_dict('list')
-fuel_economy_data = pd.Series(df_fuel_economy.FuelEconomy.values, index=df_fuel_economy.Car).to_dict()
-challenger_buying_prices = pd.Series(df_buying_prices.BuyingPrice.values, index=df_buying_prices.Car).to_dict()
-
-# Predefined Scores
-reliability_scores = {'Japanese': 0.9, 'Korean': 0.8, 'American': 0.8, 'German': 0.7}
-safety_scores = {'Japanese': 0.7, 'Korean': 0.8, 'American': 0.85, 'German': 0.9}
-challenger_nationality = {
-    'Ford Explorer': 'American',
-    'Honda Accord': 'Japanese',
-    'Nissan Altima': 'Japanese',
-    'Toyota Camry': 'Japanese',
-    'Hyundai Sonata': 'Korean',
-    'BMW 5 Series': 'German'
-}
-depreciation_rates = {
-    'American': 0.15,
-    'Japanese': 0.11,
-    'German': 0.18,
-    'Korean': 0.13
-}
+data_mtimes = _data_mtimes()
+(challenger_index, challenger_operating_costs, challenger_fuel_economy, challenger_buying_prices,
+ challenger_reliability, challenger_safety, challenger_dep_rates,
+ reliability_scores, safety_scores, depreciation_rates) = _load_static_data(data_mtimes)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def compute_results(defender_market_value, defender_operating_costs, defender_fuel_economy_kmpl,
+                    style_score_defender_input, origin_defender, challenger_car, style_score_challenger_input,
+                    weights, data_mtimes):
+    """
+    Map the raw input page values to (defender_pv, challenger_pv, defender_score,
+    challenger_score, cash_flow_defender, cash_flow_challenger, comparison) for the
+    selected challenger, where `comparison` is a dict of columns ranking every
+    challenger against the current car. Sequences are passed and returned as
+    tuples so identical inputs hit the cache; `data_mtimes` only keys the cache
+    so results are recomputed when the Excel files change.
+    """
+    challenger_cars = list(challenger_index)
+    style_score_defender = style_score_defender_input / 10
+    style_score_challenger = style_score_challenger_input / 10
+    weights = np.asarray(weights, dtype=np.float64)
+
+    kernel_inputs = (
+        float(defender_market_value), np.asarray(predict_defender_costs(defender_operating_costs), dtype=np.float64),
+        defender_fuel_economy_kmpl / 30,
+        style_score_defender, reliability_scores[origin_defender], safety_scores[origin_defender],
+        depreciation_rates.get(origin_defender, 0.1),
+        challenger_buying_prices, challenger_operating_costs, challenger_fuel_economy / 30,
+        style_score_challenger,
+        challenger_reliability, challenger_safety, challenger_dep_rates,
+    )
+    cash_flows, pvs, defender_scores, challenger_scores = compute_decision(*kernel_inputs, weights)
+
+    # Style is only rated for the selected car, so the cross-car ranking is
+    # scored with a zero style weight and carries no per-car recommendation
+    ranking_weights = weights.copy()
+    ranking_weights[WEIGHT_FACTORS.index('Style')] = 0.0
+    _, _, defender_ranking_scores, challenger_ranking_scores = compute_decision(*kernel_inputs, ranking_weights)
+    order = np.argsort(-challenger_ranking_scores, kind='stable')
+    comparison = {
+        "New Car": [challenger_cars[i] for i in order],
+        "Cost of Replacing (USD)": np.abs(pvs[1:][order]).round(2).tolist(),
+        "Score excl. Style: New Car": challenger_ranking_scores[order].round(4).tolist(),
+        "Score excl. Style: Current Car": defender_ranking_scores[order].round(4).tolist(),
+    }
+
+    row = challenger_index[challenger_car]
+    return (float(pvs[0]), float(pvs[row + 1]), float(defender_scores[row]), float(challenger_scores[row]),
+            tuple(cash_flows[0].tolist()), tuple(cash_flows[row + 1].tolist()), comparison)
 
 # Apply CSS for layout
 st.markdown(
@@ -130,11 +259,12 @@ if st.session_state.page == "input":
         origin_defender = st.selectbox("Select nationality:", ["Japanese", "Korean", "American", "German"])
 
         st.subheader("🚙 New Car Selection")
-        challenger_car = st.selectbox("Select the new car you want to buy:", list(challenger_buying_prices.keys()))
+        challenger_car = st.selectbox("Select the new car you want to buy:", list(challenger_index))
         style_score_challenger_input = st.slider(f"Style Score for {challenger_car} (0-10):", 0, 10, 9)
 
         st.subheader("⚖️ Decision Factor Weights (0-10)")
-        weights = {factor.lower().replace(" ", "_"): st.slider(f"Weight for {factor}:", 0, 10, 4 if factor in ['Style', 'Cost'] else 1) for factor in ['Style', 'Reliability', 'Cost', 'Fuel Economy', 'Safety']}
+        weight_inputs = {factor: st.slider(f"Weight for {factor}:", 0, 10, 4 if factor in ['Style', 'Cost'] else 1) for factor in ['Style', 'Reliability', 'Cost', 'Fuel Economy', 'Safety']}
+        weights = np.array([weight_inputs[factor] for factor in WEIGHT_FACTORS], dtype=np.float64)
 
     if st.button("Get Recommendation"):
         st.session_state.inputs = {
@@ -162,34 +292,11 @@ elif st.session_state.page == "results":
     style_score_challenger_input = inputs["style_score_challenger_input"]
     weights = inputs["weights"]
 
-    defender_fuel_economy_score = defender_fuel_economy_kmpl / 30
-    style_score_defender = style_score_defender_input / 10
-    style_score_challenger = style_score_challenger_input / 10
-
-    predicted_defender_costs = predict_operating_costs(defender_operating_costs)
-    dep_rate_defender = depreciation_rates.get(origin_defender, 0.1)
-    dep_rate_challenger = depreciation_rates.get(challenger_nationality[challenger_car], 0.1)
-
-    residual_value_defender = defender_market_value * (1 - dep_rate_defender) ** 5
-    residual_value_challenger = challenger_buying_prices[challenger_car] * (1 - dep_rate_challenger) ** 5
-
-    cash_flow_defender = [0] + [-cost for cost in predicted_defender_costs[:4]] + [-predicted_defender_costs[4] + residual_value_defender]
-    cash_flow_challenger = [defender_market_value - challenger_buying_prices[challenger_car]] + [-cost for cost in challenger_operating_costs_data[challenger_car][:4]] + [-challenger_operating_costs_data[challenger_car][4] + residual_value_challenger]
-
-    defender_pv = calculate_pv(cash_flow_defender)
-    challenger_pv = calculate_pv(cash_flow_challenger)
-
-    total_pv = defender_pv + challenger_pv
-    cost_score_defender = challenger_pv / total_pv
-    cost_score_challenger = defender_pv / total_pv
-
-    defender_weighted_score = calculate_weighted_score(
-        cost_score_defender, style_score_defender, reliability_scores[origin_defender],
-        defender_fuel_economy_score, safety_scores[origin_defender], weights
-    )
-    challenger_weighted_score = calculate_weighted_score(
-        cost_score_challenger, style_score_challenger, reliability_scores[challenger_nationality[challenger_car]],
-        fuel_economy_data[challenger_car] / 30, safety_scores[challenger_nationality[challenger_car]], weights
+    (defender_pv, challenger_pv, defender_weighted_score, challenger_weighted_score,
+     cash_flow_defender, cash_flow_challenger, comparison) = compute_results(
+        defender_market_value, tuple(defender_operating_costs), defender_fuel_economy_kmpl,
+        style_score_defender_input, origin_defender, challenger_car, style_score_challenger_input,
+        tuple(weights), data_mtimes
     )
 
     st.title("📊 Results and Recommendation")
@@ -208,25 +315,17 @@ elif st.session_state.page == "results":
 
     with col1:
         st.markdown("**Scenario 1: Keeping the Current Car**")
-        fig1, ax1 = plt.subplots(figsize=(6, 4))
-        ax1.bar(range(6), cash_flow_defender, color='blue')
-        ax1.axhline(0, color='black', linewidth=0.8)
-        ax1.set_ylim(min(cash_flow_defender) - 5000, max(cash_flow_defender) + 5000)
-        ax1.set_title("Keeping the Current Car", fontsize=10)
-        ax1.set_xlabel("Year", fontsize=8)
-        ax1.set_ylabel("Cash Flow (USD)", fontsize=8)
-        st.pyplot(fig1)
+        st.pyplot(plot_cash_flow(cash_flow_defender, "Keeping the Current Car", 'blue'), clear_figure=False)
 
     with col2:
         st.markdown(f"**Scenario 2: Replacing with {challenger_car}**")
-        fig2, ax2 = plt.subplots(figsize=(6, 4))
-        ax2.bar(range(6), cash_flow_challenger, color='green')
-        ax2.axhline(0, color='black', linewidth=0.8)
-        ax2.set_ylim(min(cash_flow_challenger) - 5000, max(cash_flow_challenger) + 5000)
-        ax2.set_title(f"Replacing with {challenger_car}", fontsize=10)
-        ax2.set_xlabel("Year", fontsize=8)
-        ax2.set_ylabel("Cash Flow (USD)", fontsize=8)
-        st.pyplot(fig2)
+        st.pyplot(plot_cash_flow(cash_flow_challenger, f"Replacing with {challenger_car}", 'green'), clear_figure=False)
+
+    st.subheader("🏁 All New Cars Compared")
+    st.caption("Ranked on cost, reliability, fuel economy and safety only. Style is left out "
+               "because it is only rated for the car you selected; the recommendation above "
+               "covers that car with every factor.")
+    st.dataframe(comparison, hide_index=True, width="stretch")
 
     if st.button("Go Back"):
         st.session_state.page = "input"
@@ -0,0 +1,40 @@
+"""
+Ahead-of-time compile the decision_kernel entry points into the `idss_kernel`
+extension module next to this file, so the app never pays numba's JIT warm-up.
+Run once at build/deploy time: `python build_kernel.py`
+"""
+import os
+
+from numba.pycc import CC
+
+from decision_kernel import compute_decision as _compute_decision
+from decision_kernel import predict_operating_costs as _predict_operating_costs
+
+cc = CC('idss_kernel')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+@cc.export('predict_operating_costs', 'float64[:](float64[:])')
+def predict_operating_costs(operating_costs):
+    return _predict_operating_costs(operating_costs)
+
+@cc.export(
+    'compute_decision',
+    'Tuple((float64[:, :], float64[:], float64[:], float64[:]))('
+    'float64, float64[:], float64, float64, float64, float64, float64, '
+    'float64[:], float64[:, :], float64[:], float64, float64[:], float64[:], float64[:], '
+    'float64[:])'
+)
+def compute_decision(defender_market_value, predicted_defender_costs, defender_fuel_economy_score,
+                     style_score_defender, reliability_score_defender, safety_score_defender, dep_rate_defender,
+                     challenger_buying_prices, challenger_operating_costs, challenger_fuel_economy_scores,
+                     style_score_challenger, challenger_reliability_scores, challenger_safety_scores,
+                     challenger_dep_rates, weights):
+    return _compute_decision(defender_market_value, predicted_defender_costs, defender_fuel_economy_score,
+                             style_score_defender, reliability_score_defender, safety_score_defender,
+                             dep_rate_defender, challenger_buying_prices, challenger_operating_costs,
+                             challenger_fuel_economy_scores, style_score_challenger,
+                             challenger_reliability_scores, challenger_safety_scores,
+                             challenger_dep_rates, weights)
+
+if __name__ == "__main__":
+    cc.compile()
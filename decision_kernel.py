@@ -0,0 +1,97 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # Numba is optional; without it the numeric helpers run as plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+@njit(cache=True)
+def calculate_weighted_scores(features, weights):
+    """
+    Weighted score for each row of `features` (n x 5: cost, style, reliability,
+    fuel economy and safety scores), with `weights` in the same order.
+    """
+    return (features * weights).sum(axis=1)
+
+# Discount factors for the 6-year horizon at the default 5% rate
+_PV_FACTORS = 1.0 / (1.05 ** np.arange(6, dtype=np.float64))
+
+@njit(cache=True)
+def calculate_pv(cash_flows, discount_rate=0.05):
+    """
+    Present value of each row of `cash_flows` (one scenario per row, year 0 first).
+    """
+    if discount_rate == 0.05 and cash_flows.shape[1] == 6:
+        return (cash_flows * _PV_FACTORS).sum(axis=1)
+    discount = (1.0 + discount_rate) ** np.arange(cash_flows.shape[1])
+    return (cash_flows / discount).sum(axis=1)
+
+# Past years are fixed at 1, 2, 3, so their OLS sums are constants
+_PAST_YEARS_SUM = 6.0
+_PAST_YEARS_SQ_SUM = 14.0
+_PAST_YEARS_MEAN = 2.0
+_FUTURE_YEARS = np.array([4, 5, 6, 7, 8], dtype=np.float64)
+
+@njit(cache=True)
+def predict_operating_costs(operating_costs):
+    """
+    Predict the operating costs for the next 5 years using linear regression.
+    Input: `operating_costs` must be a float array with exactly 3 values.
+    """
+    if len(operating_costs) != 3:
+        raise ValueError("Operating costs must have exactly 3 years of data.")
+    xy_sum = operating_costs[0] + 2 * operating_costs[1] + 3 * operating_costs[2]
+    slope = (3 * xy_sum - _PAST_YEARS_SUM * operating_costs.sum()) / (3 * _PAST_YEARS_SQ_SUM - _PAST_YEARS_SUM ** 2)
+    intercept = operating_costs.mean() - slope * _PAST_YEARS_MEAN
+    return np.maximum(0.0, slope * _FUTURE_YEARS + intercept)
+
+@njit(cache=True)
+def compute_decision(defender_market_value, predicted_defender_costs, defender_fuel_economy_score,
+                     style_score_defender, reliability_score_defender, safety_score_defender, dep_rate_defender,
+                     challenger_buying_prices, challenger_operating_costs, challenger_fuel_economy_scores,
+                     style_score_challenger, challenger_reliability_scores, challenger_safety_scores,
+                     challenger_dep_rates, weights):
+    """
+    Run the keep-vs-replace computation against every challenger at once, given
+    the defender's 5 predicted yearly operating costs. Row i of each challenger
+    array (and of the (n, 5) operating costs) describes one car.
+    Returns (cash_flows, pvs, defender_scores, challenger_scores): row 0 of the
+    (n + 1, 6) cash flows and of the pvs is keeping the current car, row i + 1
+    is replacing it with challenger i; the scores hold each pairwise result.
+    """
+    n = challenger_buying_prices.size
+
+    cash_flows = np.empty((n + 1, 6), dtype=np.float64)
+    cash_flows[0, 0] = 0.0
+    cash_flows[0, 1:5] = -predicted_defender_costs[:4]
+    cash_flows[0, 5] = -predicted_defender_costs[4] + defender_market_value * (1 - dep_rate_defender) ** 5
+    cash_flows[1:, 0] = defender_market_value - challenger_buying_prices
+    cash_flows[1:, 1:5] = -challenger_operating_costs[:, :4]
+    cash_flows[1:, 5] = -challenger_operating_costs[:, 4] + challenger_buying_prices * (1 - challenger_dep_rates) ** 5
+
+    pvs = calculate_pv(cash_flows)
+    defender_pv = pvs[0]
+    challenger_pvs = pvs[1:]
+    total_pvs = defender_pv + challenger_pvs
+
+    defender_features = np.empty((n, 5), dtype=np.float64)
+    defender_features[:, 0] = challenger_pvs / total_pvs
+    defender_features[:, 1] = style_score_defender
+    defender_features[:, 2] = reliability_score_defender
+    defender_features[:, 3] = defender_fuel_economy_score
+    defender_features[:, 4] = safety_score_defender
+
+    challenger_features = np.empty((n, 5), dtype=np.float64)
+    challenger_features[:, 0] = defender_pv / total_pvs
+    challenger_features[:, 1] = style_score_challenger
+    challenger_features[:, 2] = challenger_reliability_scores
+    challenger_features[:, 3] = challenger_fuel_economy_scores
+    challenger_features[:, 4] = challenger_safety_scores
+
+    return (cash_flows, pvs,
+            calculate_weighted_scores(defender_features, weights),
+            calculate_weighted_scores(challenger_features, weights))